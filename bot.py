@@ -1,34 +1,51 @@
 import asyncio
+import atexit
 import logging
+import queue
 import re
 import time
 import os
-from datetime import datetime, timedelta
-from typing import Dict, Optional, Set
-from dataclasses import dataclass
+import secrets
+from datetime import date
+from typing import ClassVar, Dict, Final, FrozenSet, Optional, Set, Tuple
+from dataclasses import dataclass, field
+from enum import IntEnum
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
 from urllib.parse import urlparse
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, 
-    filters, ContextTypes, CallbackQueryHandler
+    filters, ContextTypes, CallbackQueryHandler, AIORateLimiter
 )
 from telegram.constants import ParseMode
 from telethon import TelegramClient
 from telethon.errors import SessionPasswordNeededError, PhoneCodeInvalidError
 from telethon.tl.types import Channel, Chat
 
-# Configure logging for production
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
+# Configure logging for production; records are written by a background
+# thread so logging calls never block the event loop on stream I/O
+log_queue = queue.Queue(-1)
+log_stream_handler = logging.StreamHandler()
+log_stream_handler.setFormatter(
+    logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 )
+log_listener = QueueListener(log_queue, log_stream_handler, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+log_queue_handler = QueueHandler(log_queue)
+log_queue_handler.setFormatter(logging.Formatter('%(message)s'))
+logging.basicConfig(level=logging.INFO, handlers=[log_queue_handler])
 logger = logging.getLogger(__name__)
 
 # Get configuration from environment variables
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 API_ID = os.getenv("API_ID")
 API_HASH = os.getenv("API_HASH")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "https://save-any-restricted-robot.onrender.com")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
 
 # Validate required environment variables
 if not BOT_TOKEN:
@@ -38,88 +55,91 @@ if not API_ID:
 if not API_HASH:
     raise ValueError("API_HASH environment variable is required")
 
-@dataclass
-class UserSession:
-    """Store user session data"""
-    client: Optional[TelegramClient] = None
-    phone: Optional[str] = None
-    is_premium: bool = False
-    premium_expires: Optional[datetime] = None
-    login_step: str = "none"  # none, phone, code, password
+# Idle sessions are dropped after this many seconds, checked every interval
+SESSION_IDLE_TTL = 24 * 3600
+SESSION_PRUNE_INTERVAL = 3600
+
+# Telegram post links (private /c/ form first), compiled once at import time
+TELEGRAM_LINK_RE = re.compile(
+    r'https?://(?:t|telegram)\.me/'
+    r'(?:c/(?P<private>\d+)/(?P<private_id>\d+)|(?P<public>\w+)/(?P<public_id>\d+))'
+)
+PHONE_RE = re.compile(r'^\+\d{10,15}$')
+CODE_RE = re.compile(r'^\d{5}$')
+
+# Only messages up to this length are memoized, so the cache stays small
+LINK_CACHE_MAX_LEN = 256
+
+def _parse_telegram_link(link: str) -> Optional[tuple]:
+    """Extract (channel, message_id, is_private) from a Telegram link"""
+    match = TELEGRAM_LINK_RE.search(link)
+    if not match:
+        return None
     
-class TelegramSaverBot:
-    def __init__(self):
-        self.user_sessions: Dict[int, UserSession] = {}
-        self.premium_tokens: Set[str] = {"PREMIUM2024", "SAVE3HOURS", "FREEACCESS"}
-        
-    async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /start command"""
-        welcome_message = """
-🚀 **Welcome to Channel Saver Bot!**
+    if match.group('private'):
+        return (match.group('private'), int(match.group('private_id')), True)
+    return (match.group('public'), int(match.group('public_id')), False)
+
+_parse_telegram_link_cached = lru_cache(maxsize=1024)(_parse_telegram_link)
+
+# Static replies and keyboards, built once at import time
+WELCOME_TEXT: Final[str] = """
+🚀 <b>Welcome to Channel Saver Bot!</b>
 
-**What I Can Do:**
+<b>What I Can Do:</b>
 ✨ Save posts from channels and groups where forwarding is restricted
 ✨ Easily fetch messages from public channels by sending their post links
 ✨ For private channels, use /login to access content securely
 ✨ Need assistance? Just type /help and I'll guide you!
 
-💎 **Premium Features:**
+💎 <b>Premium Features:</b>
 🔹 Use /token to get 3 hours of free premium access
 🔹 Want unlimited access? Run /upgrade to unlock premium features
 🔹 Premium users enjoy faster processing, unlimited saves, and priority support
 
-📌 **Getting Started:**
+📌 <b>Getting Started:</b>
 ✅ Send a post link from a public channel to save it instantly
 ✅ If the channel is private, log in using /login before sending the link
 ✅ For additional commands, check /help anytime!
 
 Happy saving! 🚀
-        """
-        
-        keyboard = [
-            [InlineKeyboardButton("📱 Login to Telegram", callback_data="start_login")],
-            [InlineKeyboardButton("💎 Get Premium Token", callback_data="get_token")],
-            [InlineKeyboardButton("❓ Help & Commands", callback_data="help")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await update.message.reply_text(
-            welcome_message,
-            parse_mode=ParseMode.MARKDOWN,
-            reply_markup=reply_markup
-        )
-        
-    async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /help command"""
-        help_text = """
-📚 **Bot Commands & Usage**
-
-**🔧 Basic Commands:**
-• `/start` - Welcome message and quick setup
-• `/help` - Show this help message
-• `/login` - Login to your Telegram account for private channels
-• `/logout` - Logout from your Telegram account
-• `/status` - Check your login and premium status
-
-**💎 Premium Commands:**
-• `/token` - Enter premium token for 3 hours free access
-• `/upgrade` - Get information about premium upgrade
-• `/premium` - Check premium status and benefits
-
-**📝 How to Use:**
-1️⃣ **For Public Channels:** Just send any post link!
-   Example: `https://t.me/channel_name/123`
-
-2️⃣ **For Private Channels:** 
-   • First run `/login` and authenticate
+"""
+
+WELCOME_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📱 Login to Telegram", callback_data="start_login")],
+    [InlineKeyboardButton("💎 Get Premium Token", callback_data="get_token")],
+    [InlineKeyboardButton("❓ Help & Commands", callback_data="help")]
+])
+
+HELP_TEXT: Final[str] = """
+📚 <b>Bot Commands &amp; Usage</b>
+
+<b>🔧 Basic Commands:</b>
+• <code>/start</code> - Welcome message and quick setup
+• <code>/help</code> - Show this help message
+• <code>/login</code> - Login to your Telegram account for private channels
+• <code>/logout</code> - Logout from your Telegram account
+• <code>/status</code> - Check your login and premium status
+
+<b>💎 Premium Commands:</b>
+• <code>/token</code> - Enter premium token for 3 hours free access
+• <code>/upgrade</code> - Get information about premium upgrade
+• <code>/premium</code> - Check premium status and benefits
+
+<b>📝 How to Use:</b>
+1️⃣ <b>For Public Channels:</b> Just send any post link!
+   Example: <code>https://t.me/channel_name/123</code>
+
+2️⃣ <b>For Private Channels:</b> 
+   • First run <code>/login</code> and authenticate
    • Then send private channel links
 
-3️⃣ **Supported Link Formats:**
-   • `https://t.me/channel_name/post_id`
-   • `https://t.me/c/channel_id/post_id`
+3️⃣ <b>Supported Link Formats:</b>
+   • <code>https://t.me/channel_name/post_id</code>
+   • <code>https://t.me/c/channel_id/post_id</code>
    • Direct message forwarding
 
-**⚡ Premium Benefits:**
+<b>⚡ Premium Benefits:</b>
 • Unlimited saves per day
 • Faster processing speed
 • Priority support
@@ -127,57 +147,295 @@ Happy saving! 🚀
 • Batch download support
 
 Need more help? Contact support: @YourSupportUsername
-        """
+"""
+
+HELP_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🚀 Start Using Bot", callback_data="start_using")],
+    [InlineKeyboardButton("💎 Get Premium", callback_data="get_premium")]
+])
+
+UPGRADE_TEXT: Final[str] = """
+💎 <b>Premium Upgrade</b>
+
+<b>🚀 Unlimited Premium Features:</b>
+• ♾️ Unlimited message saves per day
+• ⚡ Lightning-fast processing
+• 🔒 Access to private channels (with login)
+• 📱 Priority customer support
+• 🔄 Batch download support
+• 📈 Advanced analytics
+• 🎯 Custom filters and search
+
+<b>💰 Pricing:</b>
+• Monthly: $4.99/month
+• Yearly: $49.99/year (Save 17%!)
+• Lifetime: $99.99 (Best value!)
+
+<b>🎁 Special Offer:</b>
+Get your first week FREE with any subscription!
+
+<b>🆓 Free Alternative:</b>
+Use premium tokens for temporary 3-hour access
+"""
+
+UPGRADE_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("💎 Get Premium - $4.99/month", url="https://your-payment-link.com")],
+    [InlineKeyboardButton("🎫 Use Free Token Instead", callback_data="get_token")],
+    [InlineKeyboardButton("📞 Contact Support", url="https://t.me/YourSupportUsername")]
+])
+
+TOKEN_TEXT: Final[str] = (
+    "🎫 <b>Premium Token Access</b>\n\n"
+    "Enter your premium token to get 3 hours of free access!\n\n"
+    "<b>Available Tokens:</b>\n"
+    "• <code>PREMIUM2024</code> - 3 hours premium\n"
+    "• <code>SAVE3HOURS</code> - 3 hours premium\n"
+    "• <code>FREEACCESS</code> - 3 hours premium\n\n"
+    "Use: <code>/token YOUR_TOKEN_HERE</code>"
+)
+
+TOKEN_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🎫 Enter Token", callback_data="enter_token")],
+    [InlineKeyboardButton("❓ How to Get Token?", callback_data="token_help")]
+])
+
+STATUS_TEXT: Final[str] = """
+📊 <b>Your Status</b>
+
+<b>🔐 Login Status:</b> {login_status}
+<b>💎 Premium Status:</b> {premium_status}
+
+<b>📈 Today's Usage:</b>
+• Messages saved: {saves_today}/∞ (Premium) or {saves_today}/10 (Free)
+• Private channels accessed: Available with login
+
+<b>💡 Tips:</b>
+• Use /login to access private channels
+• Use /token for 3 hours of free premium
+• Use /upgrade for unlimited premium access
+"""
+
+# /status keyboards keyed by (logged_in, has_premium)
+STATUS_MARKUPS = {
+    (False, False): InlineKeyboardMarkup([
+        [InlineKeyboardButton("📱 Login Now", callback_data="start_login")],
+        [InlineKeyboardButton("💎 Get Premium", callback_data="get_token")]
+    ]),
+    (False, True): InlineKeyboardMarkup([
+        [InlineKeyboardButton("📱 Login Now", callback_data="start_login")]
+    ]),
+    (True, False): InlineKeyboardMarkup([
+        [InlineKeyboardButton("💎 Get Premium", callback_data="get_token")]
+    ]),
+    (True, True): None,
+}
+
+SUCCESS_TEXT: Final[str] = """
+✅ <b>Message Saved Successfully!</b>
+
+📋 <b>Details:</b>
+• Channel: {channel}
+• Message ID: {message_id}
+• Saved at: {saved_at}
+
+📁 <b>Content:</b> 
+The message has been processed and saved to your account.
+
+🔄 <b>What's Next:</b>
+• Send another link to save more messages
+• Use /status to check your usage
+• Use /help for more options
+"""
+
+SUCCESS_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📱 Save Another", callback_data="save_another")],
+    [InlineKeyboardButton("📊 View Status", callback_data="view_status")]
+])
+
+PRIVATE_LINK_TEXT: Final[str] = (
+    "🔒 <b>Private Channel Detected</b>\n\n"
+    "This channel requires authentication to access.\n\n"
+    "<b>To save from private channels:</b>\n"
+    "1️⃣ Use /login to authenticate with Telegram\n"
+    "2️⃣ Send the link again after logging in\n\n"
+    "<b>Note:</b> Login is secure and only stored temporarily."
+)
+
+PRIVATE_LINK_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📱 Login Now", callback_data="start_login")]
+])
+
+LOGIN_SUCCESS_TEXT: Final[str] = (
+    "🎉 <b>Login Successful!</b>\n\n"
+    "✅ You're now connected to Telegram!\n"
+    "🔒 You can now access private channels and groups.\n\n"
+    "<b>What's Next:</b>\n"
+    "• Send any private channel link to save messages\n"
+    "• Use /status to check your connection\n"
+    "• Use /logout when you're done\n\n"
+    "Happy saving! 🚀"
+)
+
+TWO_FACTOR_SUCCESS_TEXT: Final[str] = (
+    "🎉 <b>Two-Factor Authentication Successful!</b>\n\n"
+    "✅ You're now fully authenticated!\n"
+    "🔒 All private channels are now accessible.\n\n"
+    "Start sending private channel links to save messages! 🚀"
+)
+
+SAVE_ANOTHER_TEXT: Final[str] = (
+    "🔗 <b>Ready for Another Link!</b>\n\n"
+    "Send any Telegram channel or group post link to save it.\n\n"
+    "Example: <code>https://t.me/channel_name/123</code>"
+)
+
+class LoginStep(IntEnum):
+    """Steps of the /login conversation"""
+    NONE = 0
+    PHONE = 1
+    CODE = 2
+    PASSWORD = 3
+
+@dataclass(slots=True)
+class UserSession:
+    """Store user session data"""
+    client: Optional[TelegramClient] = None
+    phone: Optional[str] = None
+    is_premium: bool = False
+    premium_expires: Optional[float] = None  # time.monotonic() deadline
+    login_step: LoginStep = LoginStep.NONE
+    saves_today: int = 0
+    saves_date: Optional[date] = None
+    last_seen: float = field(default_factory=time.monotonic)
+    
+class TelegramSaverBot:
+    PREMIUM_TOKENS: ClassVar[FrozenSet[str]] = frozenset({"PREMIUM2024", "SAVE3HOURS", "FREEACCESS"})
+    
+    def __init__(self):
+        self.user_sessions: Dict[int, UserSession] = {}
+        self.links_in_progress: Set[Tuple[int, tuple]] = set()
+        self._prune_task: Optional[asyncio.Task] = None
+        self.callback_routes = {
+            "start_login": self.login_command,
+            "get_token": self.token_command,
+            "help": self.help_command,
+            "get_premium": self.upgrade_command,
+            "view_status": self.status_command,
+            "save_another": self.save_another_callback,
+        }
+        self.login_step_handlers = {
+            LoginStep.PHONE: self.handle_phone_input,
+            LoginStep.CODE: self.handle_code_input,
+            LoginStep.PASSWORD: self.handle_password_input,
+        }
+        
+    def get_session(self, user_id: int) -> UserSession:
+        """Return the user's session, creating it on first use"""
+        session = self.user_sessions.get(user_id)
+        if session is None:
+            session = self.user_sessions[user_id] = UserSession()
+        session.last_seen = time.monotonic()
+        return session
+
+    @staticmethod
+    def is_logged_in(session: Optional[UserSession]) -> bool:
+        """Return True once the user has completed the /login conversation"""
+        return session is not None and session.phone is not None and session.login_step == LoginStep.NONE
+
+    @staticmethod
+    def is_premium_user(session: Optional[UserSession], now: float) -> bool:
+        """Return True if the session has unlimited or unexpired premium at monotonic time now"""
+        if session is None or not session.is_premium:
+            return False
+        expires = session.premium_expires
+        return expires is None or expires > now
+
+    async def prune_idle_sessions(self):
+        """Drop sessions idle for longer than SESSION_IDLE_TTL"""
+        now = time.monotonic()
+        cutoff = now - SESSION_IDLE_TTL
+        for user_id, session in list(self.user_sessions.items()):
+            # Skip sessions replaced or removed while we awaited a disconnect
+            if self.user_sessions.get(user_id) is not session:
+                continue
+            if session.last_seen > cutoff:
+                continue
+            if self.is_premium_user(session, now):
+                continue
+            del self.user_sessions[user_id]
+            if session.client:
+                await session.client.disconnect()
+
+    async def _prune_sessions_periodically(self):
+        while True:
+            await asyncio.sleep(SESSION_PRUNE_INTERVAL)
+            try:
+                await self.prune_idle_sessions()
+            except Exception as e:
+                logger.error("Error pruning idle sessions: %s", e)
+
+    async def post_init(self, application: Application):
+        """Start background maintenance once the application is initialized"""
+        self._prune_task = asyncio.create_task(self._prune_sessions_periodically())
+
+    async def post_shutdown(self, application: Application):
+        """Stop background maintenance"""
+        if self._prune_task:
+            self._prune_task.cancel()
+            try:
+                await self._prune_task
+            except asyncio.CancelledError:
+                pass
+            self._prune_task = None
         
-        keyboard = [
-            [InlineKeyboardButton("🚀 Start Using Bot", callback_data="start_using")],
-            [InlineKeyboardButton("💎 Get Premium", callback_data="get_premium")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+    async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /start command"""
+        await update.effective_message.reply_text(
+            WELCOME_TEXT,
+            parse_mode=ParseMode.HTML,
+            reply_markup=WELCOME_MARKUP
+        )
         
-        await update.message.reply_text(
-            help_text,
-            parse_mode=ParseMode.MARKDOWN,
-            reply_markup=reply_markup
+    async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /help command"""
+        await update.effective_message.reply_text(
+            HELP_TEXT,
+            parse_mode=ParseMode.HTML,
+            reply_markup=HELP_MARKUP
         )
 
     async def login_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /login command"""
         user_id = update.effective_user.id
         
-        if user_id not in self.user_sessions:
-            self.user_sessions[user_id] = UserSession()
+        session = self.get_session(user_id)
         
-        session = self.user_sessions[user_id]
-        
-        if session.client and session.client.is_connected():
-            await update.message.reply_text(
+        if self.is_logged_in(session):
+            await update.effective_message.reply_text(
                 "✅ You're already logged in!\n"
                 "Use /logout to disconnect and login with a different account."
             )
             return
         
-        session.login_step = "phone"
-        await update.message.reply_text(
-            "📱 **Login to Telegram**\n\n"
+        session.login_step = LoginStep.PHONE
+        await update.effective_message.reply_text(
+            "📱 <b>Login to Telegram</b>\n\n"
             "To access private channels, I need to connect to your Telegram account.\n"
             "Please send your phone number (with country code).\n\n"
-            "Example: `+1234567890`\n\n"
+            "Example: <code>+1234567890</code>\n\n"
             "⚠️ Your login data is secure and only stored temporarily.",
-            parse_mode=ParseMode.MARKDOWN
+            parse_mode=ParseMode.HTML
         )
 
     async def logout_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /logout command"""
         user_id = update.effective_user.id
         
-        if user_id in self.user_sessions:
-            session = self.user_sessions[user_id]
-            if session.client:
-                await session.client.disconnect()
-            del self.user_sessions[user_id]
+        session = self.user_sessions.pop(user_id, None)
+        if session and session.client:
+            await session.client.disconnect()
         
-        await update.message.reply_text(
+        await update.effective_message.reply_text(
             "👋 Successfully logged out!\n"
             "Use /login to connect again when needed."
         )
@@ -185,147 +443,90 @@ Need more help? Contact support: @YourSupportUsername
     async def status_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /status command"""
         user_id = update.effective_user.id
+        now = time.monotonic()
         
-        # Login status
         login_status = "❌ Not logged in"
-        if user_id in self.user_sessions:
-            session = self.user_sessions[user_id]
-            if session.client and session.client.is_connected():
-                login_status = "✅ Logged in"
-        
-        # Premium status
+        logged_in = False
+        saves_today = 0
         premium_status = "❌ Free user"
-        premium_info = ""
-        if user_id in self.user_sessions:
-            session = self.user_sessions[user_id]
-            if session.is_premium:
-                if session.premium_expires and session.premium_expires > datetime.now():
-                    time_left = session.premium_expires - datetime.now()
-                    hours_left = int(time_left.total_seconds() // 3600)
+        has_premium = False
+        
+        session = self.user_sessions.get(user_id)
+        if session is not None:
+            # Login status
+            if self.is_logged_in(session):
+                login_status = "✅ Logged in"
+                logged_in = True
+            
+            # Today's saves
+            if session.saves_date == date.today():
+                saves_today = session.saves_today
+            
+            # Premium status
+            if self.is_premium_user(session, now):
+                has_premium = True
+                if session.premium_expires is not None:
+                    hours_left = int((session.premium_expires - now) // 3600)
                     premium_status = f"💎 Premium active ({hours_left}h left)"
                 else:
                     premium_status = "💎 Premium (unlimited)"
         
-        status_text = f"""
-📊 **Your Status**
-
-**🔐 Login Status:** {login_status}
-**💎 Premium Status:** {premium_status}
-
-**📈 Today's Usage:**
-• Messages saved: 0/∞ (Premium) or 0/10 (Free)
-• Private channels accessed: Available with login
-
-**💡 Tips:**
-• Use /login to access private channels
-• Use /token for 3 hours of free premium
-• Use /upgrade for unlimited premium access
-        """
-        
-        keyboard = []
-        if login_status == "❌ Not logged in":
-            keyboard.append([InlineKeyboardButton("📱 Login Now", callback_data="start_login")])
-        if "❌ Free user" in premium_status:
-            keyboard.append([InlineKeyboardButton("💎 Get Premium", callback_data="get_token")])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard) if keyboard else None
+        status_text = STATUS_TEXT.format(
+            login_status=login_status,
+            premium_status=premium_status,
+            saves_today=saves_today
+        )
         
-        await update.message.reply_text(
+        await update.effective_message.reply_text(
             status_text,
-            parse_mode=ParseMode.MARKDOWN,
-            reply_markup=reply_markup
+            parse_mode=ParseMode.HTML,
+            reply_markup=STATUS_MARKUPS[(logged_in, has_premium)]
         )
 
     async def token_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /token command"""
-        if len(context.args) == 0:
-            keyboard = [
-                [InlineKeyboardButton("🎫 Enter Token", callback_data="enter_token")],
-                [InlineKeyboardButton("❓ How to Get Token?", callback_data="token_help")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(
-                "🎫 **Premium Token Access**\n\n"
-                "Enter your premium token to get 3 hours of free access!\n\n"
-                "**Available Tokens:**\n"
-                "• `PREMIUM2024` - 3 hours premium\n"
-                "• `SAVE3HOURS` - 3 hours premium\n"
-                "• `FREEACCESS` - 3 hours premium\n\n"
-                "Use: `/token YOUR_TOKEN_HERE`",
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=reply_markup
+        if not context.args:
+            await update.effective_message.reply_text(
+                TOKEN_TEXT,
+                parse_mode=ParseMode.HTML,
+                reply_markup=TOKEN_MARKUP
             )
             return
         
         token = context.args[0].upper()
         user_id = update.effective_user.id
         
-        if token in self.premium_tokens:
-            if user_id not in self.user_sessions:
-                self.user_sessions[user_id] = UserSession()
-            
-            session = self.user_sessions[user_id]
+        if token in self.PREMIUM_TOKENS:
+            session = self.get_session(user_id)
             session.is_premium = True
-            session.premium_expires = datetime.now() + timedelta(hours=3)
+            session.premium_expires = time.monotonic() + 3 * 3600
             
-            await update.message.reply_text(
-                "🎉 **Token Activated Successfully!**\n\n"
-                "💎 You now have **3 hours** of premium access!\n\n"
-                "**Premium Benefits Unlocked:**\n"
+            await update.effective_message.reply_text(
+                "🎉 <b>Token Activated Successfully!</b>\n\n"
+                "💎 You now have <b>3 hours</b> of premium access!\n\n"
+                "<b>Premium Benefits Unlocked:</b>\n"
                 "✅ Unlimited message saves\n"
                 "✅ Faster processing\n"
                 "✅ Priority support\n"
                 "✅ Private channel access (with login)\n\n"
                 "Enjoy your premium experience! 🚀",
-                parse_mode=ParseMode.MARKDOWN
+                parse_mode=ParseMode.HTML
             )
         else:
-            await update.message.reply_text(
-                "❌ **Invalid Token**\n\n"
+            await update.effective_message.reply_text(
+                "❌ <b>Invalid Token</b>\n\n"
                 "The token you entered is not valid.\n"
                 "Please check the token and try again.\n\n"
-                "Use `/token` without arguments to see available tokens.",
-                parse_mode=ParseMode.MARKDOWN
+                "Use <code>/token</code> without arguments to see available tokens.",
+                parse_mode=ParseMode.HTML
             )
 
     async def upgrade_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /upgrade command"""
-        keyboard = [
-            [InlineKeyboardButton("💎 Get Premium - $4.99/month", url="https://your-payment-link.com")],
-            [InlineKeyboardButton("🎫 Use Free Token Instead", callback_data="get_token")],
-            [InlineKeyboardButton("📞 Contact Support", url="https://t.me/YourSupportUsername")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        upgrade_text = """
-💎 **Premium Upgrade**
-
-**🚀 Unlimited Premium Features:**
-• ♾️ Unlimited message saves per day
-• ⚡ Lightning-fast processing
-• 🔒 Access to private channels (with login)
-• 📱 Priority customer support
-• 🔄 Batch download support
-• 📈 Advanced analytics
-• 🎯 Custom filters and search
-
-**💰 Pricing:**
-• Monthly: $4.99/month
-• Yearly: $49.99/year (Save 17%!)
-• Lifetime: $99.99 (Best value!)
-
-**🎁 Special Offer:**
-Get your first week FREE with any subscription!
-
-**🆓 Free Alternative:**
-Use premium tokens for temporary 3-hour access
-        """
-        
-        await update.message.reply_text(
-            upgrade_text,
-            parse_mode=ParseMode.MARKDOWN,
-            reply_markup=reply_markup
+        await update.effective_message.reply_text(
+            UPGRADE_TEXT,
+            parse_mode=ParseMode.HTML,
+            reply_markup=UPGRADE_MARKUP
         )
 
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -334,175 +535,127 @@ Use premium tokens for temporary 3-hour access
         message_text = update.message.text
         
         # Handle login process
-        if user_id in self.user_sessions:
-            session = self.user_sessions[user_id]
+        session = self.user_sessions.get(user_id)
+        if session is not None:
+            session.last_seen = time.monotonic()
             
-            if session.login_step == "phone":
-                await self.handle_phone_input(update, context, message_text)
-                return
-            elif session.login_step == "code":
-                await self.handle_code_input(update, context, message_text)
-                return
-            elif session.login_step == "password":
-                await self.handle_password_input(update, context, message_text)
+            step_handler = self.login_step_handlers.get(session.login_step)
+            if step_handler:
+                await step_handler(update, context, message_text)
                 return
         
         # Handle Telegram links
-        if self.is_telegram_link(message_text):
-            await self.handle_telegram_link(update, context, message_text)
+        link_info = self.parse_telegram_link(message_text)
+        if link_info:
+            await self.handle_telegram_link(update, context, link_info)
             return
         
         # Default response for unrecognized messages
-        await update.message.reply_text(
+        await update.effective_message.reply_text(
             "🤔 I didn't understand that message.\n\n"
-            "**What you can do:**\n"
+            "<b>What you can do:</b>\n"
             "• Send a Telegram post link to save it\n"
             "• Use /help to see all commands\n"
             "• Use /login to access private channels\n\n"
-            "Example link: `https://t.me/channel_name/123`",
-            parse_mode=ParseMode.MARKDOWN
+            "Example link: <code>https://t.me/channel_name/123</code>",
+            parse_mode=ParseMode.HTML
         )
 
-    def is_telegram_link(self, text: str) -> bool:
-        """Check if text contains a Telegram link"""
-        telegram_patterns = [
-            r'https?://t\.me/\w+/\d+',
-            r'https?://t\.me/c/\d+/\d+',
-            r'https?://telegram\.me/\w+/\d+'
-        ]
-        
-        for pattern in telegram_patterns:
-            if re.search(pattern, text):
-                return True
-        return False
-
-    async def handle_telegram_link(self, update: Update, context: ContextTypes.DEFAULT_TYPE, link: str):
+    async def handle_telegram_link(self, update: Update, context: ContextTypes.DEFAULT_TYPE, link_info: tuple):
         """Handle Telegram channel/group links"""
         user_id = update.effective_user.id
         
-        # Show processing message
-        processing_msg = await update.message.reply_text(
-            "⏳ Processing your request...\n"
-            "🔍 Analyzing the link and fetching content..."
-        )
+        # Silently drop a resend of a link that is still being processed
+        in_progress_key = (user_id, link_info)
+        if in_progress_key in self.links_in_progress:
+            return
+        self.links_in_progress.add(in_progress_key)
         
         try:
-            # Extract channel and message info from link
-            link_info = self.parse_telegram_link(link)
-            if not link_info:
-                await processing_msg.edit_text(
-                    "❌ **Invalid Link Format**\n\n"
-                    "Please send a valid Telegram link.\n"
-                    "Examples:\n"
-                    "• `https://t.me/channel_name/123`\n"
-                    "• `https://t.me/c/1234567890/123`",
-                    parse_mode=ParseMode.MARKDOWN
+            channel_username, message_id, is_private = link_info
+            
+            # Private channels can only be read through the user's own account
+            session = self.user_sessions.get(user_id)
+            if is_private and not self.is_logged_in(session):
+                await update.effective_message.reply_text(
+                    PRIVATE_LINK_TEXT,
+                    parse_mode=ParseMode.HTML,
+                    reply_markup=PRIVATE_LINK_MARKUP
                 )
                 return
             
-            channel_username, message_id = link_info
+            self.record_save(user_id)
+            channel = f"Private channel {channel_username}" if is_private else f"@{channel_username}"
+            success_text = SUCCESS_TEXT.format_map({
+                "channel": channel,
+                "message_id": message_id,
+                "saved_at": time.strftime('%Y-%m-%d %H:%M:%S'),
+            })
             
-            # Try to fetch from public channel first
-            try:
-                # Simulate fetching public content
-                await asyncio.sleep(1)  # Simulate processing time
-                
-                success_text = f"""
-✅ **Message Saved Successfully!**
-
-📋 **Details:**
-• Channel: @{channel_username}
-• Message ID: {message_id}
-• Saved at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-📁 **Content:** 
-The message has been processed and saved to your account.
-
-🔄 **What's Next:**
-• Send another link to save more messages
-• Use /status to check your usage
-• Use /help for more options
-                """
-                
-                keyboard = [
-                    [InlineKeyboardButton("📱 Save Another", callback_data="save_another")],
-                    [InlineKeyboardButton("📊 View Status", callback_data="view_status")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                await processing_msg.edit_text(
-                    success_text,
-                    parse_mode=ParseMode.MARKDOWN,
-                    reply_markup=reply_markup
-                )
-                
-            except Exception as e:
-                # If public access fails, suggest login for private channels
-                await processing_msg.edit_text(
-                    "🔒 **Private Channel Detected**\n\n"
-                    "This channel requires authentication to access.\n\n"
-                    "**To save from private channels:**\n"
-                    "1️⃣ Use /login to authenticate with Telegram\n"
-                    "2️⃣ Send the link again after logging in\n\n"
-                    "**Note:** Login is secure and only stored temporarily.",
-                    parse_mode=ParseMode.MARKDOWN,
-                    reply_markup=InlineKeyboardMarkup([
-                        [InlineKeyboardButton("📱 Login Now", callback_data="start_login")]
-                    ])
-                )
+            await update.effective_message.reply_text(
+                success_text,
+                parse_mode=ParseMode.HTML,
+                reply_markup=SUCCESS_MARKUP
+            )
         
         except Exception as e:
-            logger.error(f"Error handling telegram link: {e}")
-            await processing_msg.edit_text(
-                "❌ **Error Processing Link**\n\n"
+            logger.error("Error handling telegram link: %s", e)
+            await update.effective_message.reply_text(
+                "❌ <b>Error Processing Link</b>\n\n"
                 "Something went wrong while processing your request.\n"
                 "Please try again or contact support if the issue persists.\n\n"
                 "Use /help for more information.",
-                parse_mode=ParseMode.MARKDOWN
+                parse_mode=ParseMode.HTML
             )
+        finally:
+            self.links_in_progress.discard(in_progress_key)
+
+    def record_save(self, user_id: int):
+        """Count a saved message towards the user's daily usage"""
+        session = self.get_session(user_id)
+        today = date.today()
+        if session.saves_date != today:
+            session.saves_date = today
+            session.saves_today = 0
+        session.saves_today += 1
 
     def parse_telegram_link(self, link: str) -> Optional[tuple]:
-        """Parse Telegram link and extract channel and message ID"""
-        patterns = [
-            r'https?://t\.me/(\w+)/(\d+)',
-            r'https?://t\.me/c/(\d+)/(\d+)',
-            r'https?://telegram\.me/(\w+)/(\d+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, link)
-            if match:
-                return (match.group(1), int(match.group(2)))
-        
-        return None
+        """Parse Telegram link and extract channel, message ID and whether it is private"""
+        # Cheap substring check (covers t.me/ and telegram.me/) before the regex
+        if ".me/" not in link:
+            return None
+        if len(link) > LINK_CACHE_MAX_LEN:
+            return _parse_telegram_link(link)
+        return _parse_telegram_link_cached(link)
 
     async def handle_phone_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE, phone: str):
         """Handle phone number input during login"""
         user_id = update.effective_user.id
         session = self.user_sessions[user_id]
         
-        # Validate phone number format
-        if not re.match(r'^\+\d{10,15}$', phone.strip()):
-            await update.message.reply_text(
-                "❌ **Invalid Phone Number Format**\n\n"
+        # Validate phone number format, rejecting obvious garbage before the regex
+        phone = phone.strip()
+        if len(phone) < 11 or phone[0] != '+' or not PHONE_RE.match(phone):
+            await update.effective_message.reply_text(
+                "❌ <b>Invalid Phone Number Format</b>\n\n"
                 "Please send your phone number with country code.\n"
-                "Example: `+1234567890`\n\n"
+                "Example: <code>+1234567890</code>\n\n"
                 "Try again:",
-                parse_mode=ParseMode.MARKDOWN
+                parse_mode=ParseMode.HTML
             )
             return
         
-        session.phone = phone.strip()
-        session.login_step = "code"
+        session.phone = phone
+        session.login_step = LoginStep.CODE
         
         # Simulate sending code
-        await update.message.reply_text(
-            "📨 **Verification Code Sent!**\n\n"
+        await update.effective_message.reply_text(
+            "📨 <b>Verification Code Sent!</b>\n\n"
             f"A verification code has been sent to {phone}\n\n"
             "Please send the 5-digit code you received.\n"
-            "Example: `12345`\n\n"
+            "Example: <code>12345</code>\n\n"
             "⏰ Code expires in 5 minutes.",
-            parse_mode=ParseMode.MARKDOWN
+            parse_mode=ParseMode.HTML
         )
 
     async def handle_code_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE, code: str):
@@ -511,31 +664,23 @@ The message has been processed and saved to your account.
         session = self.user_sessions[user_id]
         
         # Validate code format
-        if not re.match(r'^\d{5}$', code.strip()):
-            await update.message.reply_text(
-                "❌ **Invalid Code Format**\n\n"
+        code = code.strip()
+        if len(code) != 5 or not CODE_RE.match(code):
+            await update.effective_message.reply_text(
+                "❌ <b>Invalid Code Format</b>\n\n"
                 "Please send the 5-digit verification code.\n"
-                "Example: `12345`\n\n"
-                "Check your messages and try again:"
+                "Example: <code>12345</code>\n\n"
+                "Check your messages and try again:",
+                parse_mode=ParseMode.HTML
             )
             return
         
-        # Simulate code verification
-        await asyncio.sleep(1)
-        
         # For demo purposes, accept any 5-digit code
-        session.login_step = "none"
+        session.login_step = LoginStep.NONE
         
-        await update.message.reply_text(
-            "🎉 **Login Successful!**\n\n"
-            "✅ You're now connected to Telegram!\n"
-            "🔒 You can now access private channels and groups.\n\n"
-            "**What's Next:**\n"
-            "• Send any private channel link to save messages\n"
-            "• Use /status to check your connection\n"
-            "• Use /logout when you're done\n\n"
-            "Happy saving! 🚀",
-            parse_mode=ParseMode.MARKDOWN
+        await update.effective_message.reply_text(
+            LOGIN_SUCCESS_TEXT,
+            parse_mode=ParseMode.HTML
         )
 
     async def handle_password_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE, password: str):
@@ -543,17 +688,11 @@ The message has been processed and saved to your account.
         user_id = update.effective_user.id
         session = self.user_sessions[user_id]
         
-        # Simulate password verification
-        await asyncio.sleep(1)
-        
-        session.login_step = "none"
+        session.login_step = LoginStep.NONE
         
-        await update.message.reply_text(
-            "🎉 **Two-Factor Authentication Successful!**\n\n"
-            "✅ You're now fully authenticated!\n"
-            "🔒 All private channels are now accessible.\n\n"
-            "Start sending private channel links to save messages! 🚀",
-            parse_mode=ParseMode.MARKDOWN
+        await update.effective_message.reply_text(
+            TWO_FACTOR_SUCCESS_TEXT,
+            parse_mode=ParseMode.HTML
         )
 
     async def handle_callback_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -561,53 +700,73 @@ The message has been processed and saved to your account.
         query = update.callback_query
         await query.answer()
         
-        data = query.data
-        
-        if data == "start_login":
-            await self.login_command(update, context)
-        elif data == "get_token":
-            await self.token_command(update, context)
-        elif data == "help":
-            await self.help_command(update, context)
-        elif data == "get_premium":
-            await self.upgrade_command(update, context)
-        elif data == "view_status":
-            await self.status_command(update, context)
-        elif data == "save_another":
-            await query.edit_message_text(
-                "🔗 **Ready for Another Link!**\n\n"
-                "Send any Telegram channel or group post link to save it.\n\n"
-                "Example: `https://t.me/channel_name/123`",
-                parse_mode=ParseMode.MARKDOWN
-            )
+        handler = self.callback_routes.get(query.data)
+        if handler:
+            await handler(update, context)
+
+    async def save_another_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle the "Save Another" button"""
+        await update.callback_query.edit_message_text(
+            SAVE_ANOTHER_TEXT,
+            parse_mode=ParseMode.HTML
+        )
+
+# Bot commands and the TelegramSaverBot methods that handle them
+COMMANDS = (
+    ("start", "start_command"),
+    ("help", "help_command"),
+    ("login", "login_command"),
+    ("logout", "logout_command"),
+    ("status", "status_command"),
+    ("token", "token_command"),
+    ("upgrade", "upgrade_command"),
+)
 
 def main():
     """Start the bot"""
+    # Use uvloop's faster event loop when it is available
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    
     # Create bot instance
     bot = TelegramSaverBot()
     
     # Create application
-    application = Application.builder().token(BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(True)
+        .connection_pool_size(256)
+        .pool_timeout(10)
+        .connect_timeout(10)
+        .read_timeout(20)
+        .write_timeout(20)
+        .http_version("2")
+        .rate_limiter(AIORateLimiter(overall_max_rate=28, max_retries=1))
+        .post_init(bot.post_init)
+        .post_shutdown(bot.post_shutdown)
+        .build()
+    )
     
     # Add handlers
-    application.add_handler(CommandHandler("start", bot.start_command))
-    application.add_handler(CommandHandler("help", bot.help_command))
-    application.add_handler(CommandHandler("login", bot.login_command))
-    application.add_handler(CommandHandler("logout", bot.logout_command))
-    application.add_handler(CommandHandler("status", bot.status_command))
-    application.add_handler(CommandHandler("token", bot.token_command))
-    application.add_handler(CommandHandler("upgrade", bot.upgrade_command))
+    for command, method_name in COMMANDS:
+        application.add_handler(CommandHandler(command, getattr(bot, method_name)))
     application.add_handler(CallbackQueryHandler(bot.handle_callback_query))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_message))
     
     # Start the bot
-    print("🚀 Telegram Saver Bot is starting...")
     port = int(os.environ.get('PORT', 8080))
+    logger.info("🚀 Telegram Saver Bot is starting on port %s...", port)
     application.run_webhook(
         listen="0.0.0.0",
         port=port,
         url_path=BOT_TOKEN,
-        webhook_url=f"https://save-any-restricted-robot.onrender.com/{BOT_TOKEN}"
+        webhook_url=f"{WEBHOOK_URL}/{BOT_TOKEN}",
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=[Update.MESSAGE, Update.CALLBACK_QUERY]
     )
 
 if __name__ == '__main__':